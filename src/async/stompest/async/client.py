@@ -30,13 +30,14 @@ API
 ---
 """
 import logging
+from operator import methodcaller
 
-from twisted.internet import defer, task
+from twisted.internet import defer
 from twisted.python import failure
 
 from stompest.error import StompConnectionError, StompFrameError
 from stompest.protocol import StompSession, StompSpec
-from stompest.util import checkattr
+from stompest.util import checkattr, frameInfo
 
 from stompest.async import util, listener
 from stompest.async.protocol import StompProtocolCreator
@@ -45,6 +46,8 @@ LOG_CATEGORY = __name__
 
 connected = checkattr('_protocol')
 
+_subscriptionOnMessage = getattr(listener.SubscriptionListener.onMessage, '__func__', listener.SubscriptionListener.onMessage) # unbound method (Python 2) or function
+
 class Stomp(object):
     """An asynchronous STOMP client for the Twisted framework.
 
@@ -75,6 +78,7 @@ class Stomp(object):
         }
 
         self._listeners = []
+        self._messageListeners = {}
 
     #
     # interface
@@ -84,12 +88,14 @@ class Stomp(object):
         """
         if listener not in self._listeners:
             self._listeners.append(listener)
+            self._messageListeners.clear()
             listener.onAdd(self)
 
     def remove(self, listener):
         """Remove a listener from this client. 
         """
         self._listeners.remove(listener)
+        self._messageListeners.clear()
 
     @property
     def disconnected(self):
@@ -118,14 +124,16 @@ class Stomp(object):
     def _protocol(self, protocol):
         self.__protocol = protocol
 
-    @defer.inlineCallbacks
     def sendFrame(self, frame):
         """Send a raw STOMP frame.
 
         .. note :: If we are not connected, this method, and all other API commands for sending STOMP frames except :meth:`~.async.client.Stomp.connect`, will raise a :class:`~.StompConnectionError`. Use this command only if you have to bypass the :class:`~.StompSession` logic and you know what you're doing!
         """
-        self._protocol.send(frame)
-        yield self._notify(lambda l: l.onSend(self, frame))
+        try:
+            self._protocol.send(frame)
+        except Exception:
+            return defer.fail()
+        return self._notify(methodcaller('onSend', self, frame))
 
     @property
     def session(self):
@@ -167,7 +175,7 @@ class Stomp(object):
         try:
             frame = self.session.connect(self._config.login, self._config.passcode, headers, versions, host, heartBeats)
             self.sendFrame(frame)
-            yield self._notify(lambda l: l.onConnect(self, frame, connectedTimeout))
+            yield self._notify(methodcaller('onConnect', self, frame, connectedTimeout))
         except Exception as e:
             self.disconnect(reason=e)
             yield self.disconnected
@@ -188,65 +196,59 @@ class Stomp(object):
         """
         protocol = self._protocol
         try:
-            yield self._notify(lambda l: l.onDisconnect(self, reason, timeout))
+            yield self._notify(methodcaller('onDisconnect', self, reason, timeout))
             if self.session.state == self.session.CONNECTED:
                 yield self.sendFrame(self.session.disconnect(receipt))
         finally:
             protocol.loseConnection()
 
     @connected
-    @defer.inlineCallbacks
     def send(self, destination, body=b'', headers=None, receipt=None):
         """send(destination, body=b'', headers=None, receipt=None)
 
         Send a **SEND** frame.
         """
-        yield self.sendFrame(self.session.send(destination, body, headers, receipt))
+        return self._sendCommand(self.session.send, destination, body, headers, receipt)
 
     @connected
-    @defer.inlineCallbacks
     def ack(self, frame, receipt=None):
         """ack(frame, receipt=None)
 
         Send an **ACK** frame for a received **MESSAGE** frame.
         """
-        yield self.sendFrame(self.session.ack(frame, receipt))
+        return self._sendCommand(self.session.ack, frame, receipt)
 
     @connected
-    @defer.inlineCallbacks
     def nack(self, frame, receipt=None):
         """nack(frame, receipt=None)
 
         Send a **NACK** frame for a received **MESSAGE** frame.
         """
-        yield self.sendFrame(self.session.nack(frame, receipt))
+        return self._sendCommand(self.session.nack, frame, receipt)
 
     @connected
-    @defer.inlineCallbacks
     def begin(self, transaction=None, receipt=None):
         """begin(transaction=None, receipt=None)
 
         Send a **BEGIN** frame to begin a STOMP transaction.
         """
-        yield self.sendFrame(self.session.begin(transaction, receipt))
+        return self._sendCommand(self.session.begin, transaction, receipt)
 
     @connected
-    @defer.inlineCallbacks
     def abort(self, transaction=None, receipt=None):
         """abort(transaction=None, receipt=None)
 
         Send an **ABORT** frame to abort a STOMP transaction.
         """
-        yield self.sendFrame(self.session.abort(transaction, receipt))
+        return self._sendCommand(self.session.abort, transaction, receipt)
 
     @connected
-    @defer.inlineCallbacks
     def commit(self, transaction=None, receipt=None):
         """commit(transaction=None, receipt=None)
 
         Send a **COMMIT** frame to commit a STOMP transaction.
         """
-        yield self.sendFrame(self.session.commit(transaction, receipt))
+        return self._sendCommand(self.session.commit, transaction, receipt)
 
     @connected
     @defer.inlineCallbacks
@@ -272,38 +274,38 @@ class Stomp(object):
         Send an **UNSUBSCRIBE** frame to terminate an existing subscription.
 
         :param token: The result of the :meth:`~.async.client.Stomp.subscribe` command which initiated the subscription in question.
+
+        .. note :: As for :meth:`~.async.client.Stomp.disconnect`, the listeners are notified before the **UNSUBSCRIBE** frame is sent. This way, the subscription's :class:`~.async.listener.SubscriptionListener` may still ack its messages (the broker rejects acks for a subscription it doesn't know).
         """
         context = self.session.subscription(token)
         frame = self.session.unsubscribe(token, receipt)
+        yield self._notify(methodcaller('onUnsubscribe', self, frame, context))
         yield self.sendFrame(frame)
-        yield self._notify(lambda l: l.onUnsubscribe(self, frame, context))
 
     #
     # callbacks for received STOMP frames
     #
     @defer.inlineCallbacks
     def _onFrame(self, frame):
-        yield self._notify(lambda l: l.onFrame(self, frame))
+        yield self._notify(methodcaller('onFrame', self, frame))
         if not frame:
             defer.returnValue(None)
-        try:
-            handler = self._handlers[frame.command]
-        except KeyError:
+        handler = self._handlers.get(frame.command)
+        if handler is None:
             raise StompFrameError('Unknown STOMP command: %s' % repr(frame))
         yield handler(frame)
 
     @defer.inlineCallbacks
     def _onConnected(self, frame):
         self.session.connected(frame)
-        self.log.info('Connected to stomp broker [session=%s, version=%s]' % (self.session.id, self.session.version))
+        self.log.info('Connected to stomp broker [session=%s, version=%s]', self.session.id, self.session.version)
         self._protocol.setVersion(self.session.version)
-        yield self._notify(lambda l: l.onConnected(self, frame))
+        yield self._notify(methodcaller('onConnected', self, frame))
 
     @defer.inlineCallbacks
     def _onError(self, frame):
-        yield self._notify(lambda l: l.onError(self, frame))
+        yield self._notify(methodcaller('onError', self, frame))
 
-    @defer.inlineCallbacks
     def _onMessage(self, frame):
         headers = frame.headers
         messageId = headers[StompSpec.MESSAGE_ID_HEADER]
@@ -311,30 +313,46 @@ class Stomp(object):
         try:
             token = self.session.message(frame)
         except:
-            self.log.error('Ignoring message (no handler found): %s [%s]' % (messageId, frame.info()))
-            defer.returnValue(None)
+            self.log.error('Ignoring message (no handler found): %s [%s]', messageId, frameInfo(frame))
+            return defer.succeed(None)
         context = self.session.subscription(token)
 
-        try:
-            yield self._notify(lambda l: l.onMessage(self, frame, context))
-        except Exception as e:
-            self.log.error('Disconnecting (error in message handler): %s [%s]' % (messageId, frame.info()))
-            self.disconnect(reason=e)
+        return self._notify(methodcaller('onMessage', self, frame, context), self._listenersForMessage(context)).addErrback(self._onMessageFailed, messageId, frame)
+
+    def _onMessageFailed(self, failure, messageId, frame):
+        failure.trap(Exception)
+        self.log.error('Disconnecting (error in message handler): %s [%s]', messageId, frameInfo(frame))
+        self.disconnect(reason=failure.value)
 
     @defer.inlineCallbacks
     def _onReceipt(self, frame):
         receipt = self.session.receipt(frame)
-        yield self._notify(lambda l: l.onReceipt(self, frame, receipt))
+        yield self._notify(methodcaller('onReceipt', self, frame, receipt))
 
     #
     # private helpers
     #
+    def _listenersForMessage(self, context):
+        # SubscriptionListener.onMessage ignores all messages but those for its own subscription, so we skip it for the others (but not an overridden onMessage)
+        try:
+            return self._messageListeners[context]
+        except KeyError:
+            listeners = [l for l in self._listeners if (l is context) or (getattr(l.onMessage, '__func__', None) is not _subscriptionOnMessage)]
+            return self._messageListeners.setdefault(context, listeners)
+
+    def _sendCommand(self, command, *args):
+        try:
+            frame = command(*args)
+        except Exception:
+            return defer.fail()
+        return self.sendFrame(frame)
+
     @defer.inlineCallbacks
-    def _notify(self, notify):
+    def _notify(self, notify, listeners=None):
         failed = None
-        for listener in list(self._listeners):
+        for listener in list(self._listeners if (listeners is None) else listeners):
             try:
-                yield notify(listener)
+                yield util.fromCoroutine(notify(listener))
             except Exception as e:
                 if not failed:
                     failed = e
@@ -344,11 +362,16 @@ class Stomp(object):
     @defer.inlineCallbacks
     def _onConnectionLost(self, reason):
         self._protocol = None
-        yield self._notify(lambda l: l.onConnectionLost(self, reason))
+        yield self._notify(methodcaller('onConnectionLost', self, reason))
 
     def _replay(self):
-        def replay():
-            for (destination, headers, receipt, context) in self.session.replay():
-                self.log.info('Replaying subscription: %s' % headers)
-                yield self.subscribe(destination, headers=headers, receipt=receipt, listener=context)
-        return task.cooperate(replay()).whenDone()
+        # send all SUBSCRIBE frames right away instead of waiting for each of them (and its RECEIPT) in turn
+        replayed = []
+        for (destination, headers, receipt, context) in self.session.replay():
+            self.log.info('Replaying subscription: %s', headers)
+            replayed.append(self.subscribe(destination, headers=headers, receipt=receipt, listener=context))
+        return defer.gatherResults(replayed, consumeErrors=True).addErrback(self._onReplayFailed)
+
+    def _onReplayFailed(self, failure):
+        failure.trap(defer.FirstError)
+        return failure.value.subFailure
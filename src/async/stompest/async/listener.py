@@ -1,18 +1,19 @@
 import logging
 import time
 
-from twisted.internet import defer, reactor, task
+from twisted.internet import defer, reactor
 from twisted.python import failure
 
-from stompest.error import StompConnectionError, StompCancelledError, StompProtocolError
+from stompest.error import StompAlreadyRunningError, StompConnectionError, StompCancelledError, StompProtocolError
 from stompest.protocol import StompSpec
+from stompest.util import frameInfo
 
-from stompest.async.util import InFlightOperations, WaitingDeferred, sendToErrorDestination
+from stompest.async.util import InFlightOperations, WaitingDeferred, fromCoroutine, iscoroutine, sendToErrorDestination
 
 LOG_CATEGORY = __name__
 
 class Listener(object):
-    """This base class defines the interface for the handlers of possible asynchronous STOMP connection events. You may implement any subset of these event handlers and add the resulting listener to the :class:`~.async.client.Stomp` connection.
+    """This base class defines the interface for the handlers of possible asynchronous STOMP connection events. You may implement any subset of these event handlers and add the resulting listener to the :class:`~.async.client.Stomp` connection. An event handler may return a :class:`twisted.internet.defer.Deferred` or, on Python 3.5 and higher, be an ``async def`` coroutine function.
     """
     def __str__(self):
         return self.__class__.__name__
@@ -98,7 +99,7 @@ class DisconnectListener(Listener):
         connection.disconnected = defer.Deferred()
 
     def onConnectionLost(self, connection, reason):
-        self.log.info('Disconnected: %s' % reason.getErrorMessage())
+        self.log.info('Disconnected: %s', reason.getErrorMessage())
         if not self._disconnecting:
             self._disconnectReason = StompConnectionError('Unexpected connection loss [%s]' % reason.getErrorMessage())
 
@@ -107,7 +108,7 @@ class DisconnectListener(Listener):
 
         if self._disconnectReason:
             if self.log.isEnabledFor(logging.DEBUG):
-                self.log.debug('Calling disconnected errback: %s' % self._disconnectReason)
+                self.log.debug('Calling disconnected errback: %s', self._disconnectReason)
             connection.disconnected.errback(self._disconnectReason)
         else:
             if self.log.isEnabledFor(logging.DEBUG):
@@ -119,12 +120,12 @@ class DisconnectListener(Listener):
         if self._disconnecting:
             return
         self._disconnecting = True
-        self.log.info('Disconnecting ...%s' % ((' [reason=%s]' % reason) if reason else ''))
+        self.log.info('Disconnecting ...%s', (' [reason=%s]' % reason) if reason else '')
 
     def onMessage(self, connection, frame, context): # @UnusedVariable
         if not self._disconnecting:
             return
-        self.log.info('Ignoring message (disconnecting): %s [%s]' % (frame.headers[StompSpec.MESSAGE_ID_HEADER], frame.info()))
+        self.log.info('Ignoring message (disconnecting): %s [%s]', frame.headers[StompSpec.MESSAGE_ID_HEADER], frameInfo(frame))
 
     @property
     def _disconnectReason(self):
@@ -135,7 +136,7 @@ class DisconnectListener(Listener):
         if reason is None:
             self.__disconnectReason = reason
         else:
-            self.log.error('Disconnect because of failure: %s' % reason)
+            self.log.error('Disconnect because of failure: %s', reason)
             if self.__disconnectReason is None:
                 self.__disconnectReason = reason
 
@@ -173,53 +174,79 @@ class ReceiptListener(Listener):
 class SubscriptionListener(Listener):
     """Corresponds to a STOMP subscription.
     
-    :param handler: A callable :obj:`f(client, frame)` which accepts a :class:`~.async.client.Stomp` connection and the received :class:`~.StompFrame`.
+    :param handler: A callable :obj:`f(client, frame)` which accepts a :class:`~.async.client.Stomp` connection and the received :class:`~.StompFrame`. It may return a :class:`twisted.internet.defer.Deferred` or be an ``async def`` coroutine function.
     :param ack: Check this option if you wish to automatically ack **MESSAGE** frames after they were handled (successfully or not).
     :param errorDestination: If a frame was not handled successfully, forward a copy of the offending frame to this destination. Example: ``errorDestination='/queue/back-to-square-one'``
     :param onMessageFailed: You can specify a custom error handler which must be a callable with signature :obj:`f(connection, failure, frame, errorDestination)`. Note that a non-trivial choice of this error handler overrides the default behavior (forward frame to error destination and ack it).
+    :param ackBatchSize: If the subscription's **ack** header is :attr:`~.StompSpec.ACK_CLIENT` (cumulative ack), send only one **ACK** frame for (at most) this many handled messages. The default :obj:`None` means that each message is acked individually (unless **ackBatchInterval** is set).
+    :param ackBatchInterval: If the subscription's **ack** header is :attr:`~.StompSpec.ACK_CLIENT`, send one **ACK** frame for all messages which were handled during the last **ackBatchInterval** seconds. Pending acks are also sent upon disconnect and unsubscribe. Use this option together with **ackBatchSize** (or a small interval), because the broker will stop delivering messages if more than its prefetch limit of messages remain unacked.
     
     .. seealso :: The unit tests in the module :mod:`.tests.async_client_integration_test` cover a couple of usage scenarios.
 
     """
     DEFAULT_ACK_MODE = 'client-individual'
 
-    def __init__(self, handler, ack=True, errorDestination=None, onMessageFailed=None):
+    def __init__(self, handler, ack=True, errorDestination=None, onMessageFailed=None, ackBatchSize=None, ackBatchInterval=None):
         if not callable(handler):
             raise ValueError('Handler is not callable: %s' % handler)
         self._handler = handler
         self._ack = ack
         self._errorDestination = errorDestination
         self._onMessageFailed = onMessageFailed or sendToErrorDestination
+        self._ackBatchSize = ackBatchSize
+        self._ackBatchInterval = ackBatchInterval
+        self._pendingAck = None # (arrival, frame) of the latest handled message which is not acked yet
+        self._pendingAcks = 0
+        self._ackedArrival = -1 # the latest message covered by a cumulative ack
+        self._ackBatchTimer = None
         self._headers = None
-        self._messages = InFlightOperations('Handler for message')
+        self._autoAck = False # ack each handled message (set upon subscribe)
+        self._batchAcks = False # collect these acks into cumulative ones (set upon subscribe)
+        self._messages = {} # arrivals (sequence numbers) of the messages whose handlers are in progress, by message id
+        self._arrivals = 0
+        self._idle = None # fires when the last handler in progress is complete (only created if someone waits for it)
         self.log = logging.getLogger(LOG_CATEGORY)
 
     @defer.inlineCallbacks
     def onDisconnect(self, connection, reason, timeout): # @UnusedVariable
         connection.remove(self)
-        if not self._messages:
-            defer.returnValue(None)
-        self.log.info('Waiting for outstanding message handlers to finish ... [timeout=%s]' % timeout)
-        yield self._waitForMessages(timeout)
-        self.log.info('All handlers complete. Resuming disconnect ...')
+        try:
+            if self._messages:
+                self.log.info('Waiting for outstanding message handlers to finish ... [timeout=%s]', timeout)
+                yield self._waitForMessages(timeout)
+                self.log.info('All handlers complete. Resuming disconnect ...')
+            yield self._flushAcks(connection)
+        finally:
+            self._discardAcks()
 
-    @defer.inlineCallbacks
     def onMessage(self, connection, frame, context):
         """onMessage(connection, frame, context)
         
         Handle a message originating from this listener's subscription."""
         if context is not self:
             return
-        with self._messages(frame.headers[StompSpec.MESSAGE_ID_HEADER], self.log) as waiting:
+        messageId = frame.headers[StompSpec.MESSAGE_ID_HEADER]
+        if messageId in self._messages:
+            raise StompAlreadyRunningError('Handler for message %s already in progress' % messageId)
+        self._messages[messageId] = self._arrivals
+        self._arrivals += 1
+        if self.log.isEnabledFor(logging.DEBUG):
+            self.log.debug('Handler for message %s started.', messageId)
+        try:
+            result = self._handler(connection, frame)
+        except Exception:
+            result = defer.fail()
+        if isinstance(result, defer.Deferred) or iscoroutine(result):
+            result = self._onHandled(connection, frame, fromCoroutine(result))
+        elif self._autoAck:
+            # the handler returned synchronously: ack without going through a generator
             try:
-                yield self._handler(connection, frame)
-            except Exception as e:
-                yield self._onMessageFailed(connection, e, frame, self._errorDestination)
-            finally:
-                if self._ack and (self._headers[StompSpec.ACK_HEADER] in StompSpec.CLIENT_ACK_MODES):
-                    yield connection.ack(frame)
-                if not waiting.called:
-                    waiting.callback(None)
+                result = self._ackMessage(connection, frame)
+            except Exception:
+                result = defer.fail()
+        if isinstance(result, defer.Deferred):
+            return result.addBoth(self._onMessageComplete, messageId)
+        self._onMessageComplete(None, messageId)
 
     def onSubscribe(self, connection, frame, context): # @UnusedVariable
         """Set the **ack** header of the **SUBSCRIBE** frame initiating this listener's subscription to the value of the class atrribute :attr:`DEFAULT_ACK_MODE` (if it isn't set already). Keep a copy of the headers for handling messages originating from this subscription."""
@@ -229,6 +256,9 @@ class SubscriptionListener(Listener):
             return
         frame.headers.setdefault(StompSpec.ACK_HEADER, self.DEFAULT_ACK_MODE)
         self._headers = frame.headers
+        ackMode = self._headers[StompSpec.ACK_HEADER]
+        self._autoAck = self._ack and (ackMode in StompSpec.CLIENT_ACK_MODES)
+        self._batchAcks = ((self._ackBatchSize is not None) or (self._ackBatchInterval is not None)) and (ackMode == StompSpec.ACK_CLIENT)
 
     @defer.inlineCallbacks
     def onUnsubscribe(self, connection, frame, context): # @UnusedVariable
@@ -239,15 +269,88 @@ class SubscriptionListener(Listener):
             return
         connection.remove(self)
         yield self._waitForMessages(None)
+        yield self._flushAcks(connection)
 
     def onConnectionLost(self, connection, reason): # @UnusedVariable
         """onConnectionLost(connection, reason)
         
         Forget everything about this listener's subscription and unregister from the **connection**."""
         connection.remove(self)
+        self._discardAcks()
+
+    def _ackMessage(self, connection, frame):
+        if not self._batchAcks:
+            return connection.ack(frame)
+        arrival = self._messages[frame.headers[StompSpec.MESSAGE_ID_HEADER]]
+        if arrival <= self._ackedArrival: # a later message was acked already (cumulatively)
+            return
+        if (self._pendingAck is None) or (arrival > self._pendingAck[0]): # handlers may finish out of order, but a cumulative ack must cover the latest message
+            self._pendingAck = (arrival, frame)
+        self._pendingAcks += 1
+        if (self._ackBatchSize is not None) and (self._pendingAcks >= self._ackBatchSize):
+            return self._flushAcks(connection)
+        if (self._ackBatchInterval is not None) and (self._ackBatchTimer is None):
+            self._ackBatchTimer = reactor.callLater(self._ackBatchInterval, self._onAckBatchInterval, connection) # @UndefinedVariable
+
+    @defer.inlineCallbacks
+    def _onHandled(self, connection, frame, handled):
+        try:
+            yield handled
+        except Exception as e:
+            yield fromCoroutine(self._onMessageFailed(connection, e, frame, self._errorDestination))
+        finally:
+            if self._autoAck:
+                yield self._ackMessage(connection, frame)
+
+    def _onMessageComplete(self, result, messageId):
+        self._messages.pop(messageId, None)
+        failed = isinstance(result, failure.Failure)
+        if failed:
+            self.log.error('Handler for message %s failed [%s]', messageId, result.value)
+        elif self.log.isEnabledFor(logging.DEBUG):
+            self.log.debug('Handler for message %s complete.', messageId)
+        if (self._idle is not None) and (failed or not self._messages):
+            idle, self._idle = self._idle, None
+            if not idle.called:
+                if failed:
+                    idle.errback(result)
+                else:
+                    idle.callback(None)
+        if failed:
+            return result
+
+    def _discardAcks(self):
+        if self._ackBatchTimer is not None:
+            if self._ackBatchTimer.active():
+                self._ackBatchTimer.cancel()
+            self._ackBatchTimer = None
+        self._pendingAck = None
+        self._pendingAcks = 0
+
+    def _onAckBatchInterval(self, connection):
+        acked = self._flushAcks(connection)
+        if acked is not None: # nobody else is waiting for this ack
+            acked.addErrback(self._onAckFailed)
+
+    def _onAckFailed(self, failure):
+        self.log.error('Cumulative ack failed: %s', failure.getErrorMessage())
+
+    def _flushAcks(self, connection):
+        (pendingAck, count) = (self._pendingAck, self._pendingAcks)
+        self._discardAcks()
+        if pendingAck is None:
+            return
+        (self._ackedArrival, frame) = pendingAck
+        if self.log.isEnabledFor(logging.DEBUG):
+            self.log.debug('Sending cumulative ack for %d message(s): %s', count, frame.headers[StompSpec.MESSAGE_ID_HEADER])
+        return connection.ack(frame)
 
     def _waitForMessages(self, timeout):
-        return task.cooperate(handler.wait(timeout, StompCancelledError('Handlers did not finish in time.')) for handler in list(self._messages.values())).whenDone()
+        if not self._messages:
+            return defer.succeed(None)
+        if (self._idle is None) or self._idle.called:
+            self._idle = WaitingDeferred()
+        return self._idle.wait(timeout, StompCancelledError('Handlers did not finish in time.'))
 
 class HeartBeatListener(Listener):
     """Handles heart-beating.
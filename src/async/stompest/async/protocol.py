@@ -1,37 +1,42 @@
 import logging
 
-from twisted.internet import defer, reactor, task
+from twisted.internet import defer, reactor, task, threads
 from twisted.internet.protocol import Factory, Protocol
 
-from stompest._backwards import binaryType
 from stompest.protocol import StompFailoverTransport, StompParser
+from stompest.util import frameInfo
 
 LOG_CATEGORY = __name__
 
 class StompProtocol(Protocol):
+    # chunks of received data of at least this many bytes are parsed in the reactor's thread pool (None: always parse in the reactor thread);
+    # frames are still handed to the frame callback in the reactor thread and in their original order
+    PARSE_IN_THREAD_THRESHOLD = None
+
     #
     # twisted.internet.Protocol interface overrides
     #
     def connectionLost(self, reason):
+        self._connectionLost = True
         try:
             self._onConnectionLost(reason)
         finally:
             Protocol.connectionLost(self, reason)
 
     def dataReceived(self, data):
+        if self._parsing.locked or self._parseInThread(data):
+            self._parsing.run(self._parse, data).addErrback(self._onParseError)
+            return
         self._parser.add(data)
-        for frame in iter(self._parser.get, self._parser.SENTINEL):
-            if self.log.isEnabledFor(logging.DEBUG):
-                self.log.debug('Received %s' % frame.info())
-            try:
-                self._onFrame(frame)
-            except Exception as e:
-                self.log.error('Unhandled error in frame handler: %s' % e)
+        self._dispatch()
 
     def __init__(self, onFrame, onConnectionLost):
         self._onFrame = onFrame
         self._onConnectionLost = onConnectionLost
         self._parser = StompParser()
+        self._parsing = defer.DeferredLock()
+        self._connectionLost = False
+        self._outgoing = None # collects the frames sent while a chunk of received data is dispatched
 
         # leave the logger public in case the user wants to override it
         self.log = logging.getLogger(LOG_CATEGORY)
@@ -40,16 +45,58 @@ class StompProtocol(Protocol):
     # user interface
     #
     def loseConnection(self):
+        self._flush()
         self.transport.loseConnection()
 
     def send(self, frame):
         if self.log.isEnabledFor(logging.DEBUG):
-            self.log.debug('Sending %s' % frame.info())
-        self.transport.write(binaryType(frame))
+            self.log.debug('Sending %s', frameInfo(frame))
+        if self._outgoing is None:
+            self.transport.writeSequence(frame.chunks())
+        else:
+            self._outgoing.extend(frame.chunks())
 
     def setVersion(self, version):
         self._parser.version = version
 
+    #
+    # private helpers
+    #
+    def _dispatch(self):
+        if self._connectionLost:
+            return
+        parser, onFrame, log = self._parser, self._onFrame, self.log
+        debug = log.isEnabledFor(logging.DEBUG) # re-evaluated once per chunk of received data (not per frame)
+        self._outgoing = [] # frames sent by synchronous handlers (like acks) go out in a single write
+        try:
+            for frame in iter(parser.get, parser.SENTINEL):
+                if debug:
+                    log.debug('Received %s', frameInfo(frame))
+                try:
+                    onFrame(frame)
+                except Exception as e:
+                    log.error('Unhandled error in frame handler: %s', e)
+        finally:
+            self._flush()
+
+    def _flush(self):
+        outgoing, self._outgoing = self._outgoing, None
+        if outgoing:
+            self.transport.writeSequence(outgoing)
+
+    def _onParseError(self, failure):
+        self.log.error('Disconnecting (invalid data received): %s', failure.getErrorMessage())
+        self.transport.loseConnection()
+
+    def _parse(self, data):
+        if not self._parseInThread(data):
+            self._parser.add(data)
+            return self._dispatch()
+        return threads.deferToThread(self._parser.add, data).addCallback(lambda _: self._dispatch())
+
+    def _parseInThread(self, data):
+        return (self.PARSE_IN_THREAD_THRESHOLD is not None) and (len(data) >= self.PARSE_IN_THREAD_THRESHOLD)
+
 class StompFactory(Factory):
     protocol = StompProtocol
 
@@ -76,11 +123,11 @@ class StompProtocolCreator(object):
         for (broker, delay) in self._failover:
             yield self._sleep(delay)
             endpoint = self._endpointFactory(broker, timeout)
-            self.log.info('Connecting to %(host)s:%(port)s ...' % broker)
+            self.log.info('Connecting to %(host)s:%(port)s ...', broker)
             try:
                 protocol = yield endpoint.connect(self.protocolFactory(*args, **kwargs))
             except Exception as e:
-                self.log.warning('%s [%s]' % ('Could not connect to %(host)s:%(port)d' % broker, e))
+                self.log.warning('Could not connect to %s:%d [%s]', broker['host'], broker['port'], e)
             else:
                 defer.returnValue(protocol)
         raise e
@@ -88,5 +135,5 @@ class StompProtocolCreator(object):
     def _sleep(self, delay):
         if not delay:
             return
-        self.log.info('Delaying connect attempt for %d ms' % int(delay * 1000))
+        self.log.info('Delaying connect attempt for %d ms', int(delay * 1000))
         return task.deferLater(reactor, delay, lambda: None)
@@ -1,17 +1,21 @@
 import logging
+import sys
 
-from twisted.internet import defer, reactor
+from twisted.internet import defer, reactor, task
 from twisted.internet.protocol import Factory
+from twisted.test.proto_helpers import StringTransport
 from twisted.python import log
 from twisted.trial import unittest
 
 from stompest.async import Stomp
-from stompest.async.listener import SubscriptionListener
+from stompest.async import listener as asyncListener
+from stompest.async.listener import Listener, SubscriptionListener
+from stompest.async.protocol import StompProtocol
 from stompest.config import StompConfig
 from stompest.error import StompCancelledError, StompConnectionError, StompProtocolError
 from stompest.protocol import StompSpec, StompFrame
 
-from .broker_simulator import BlackHoleStompServer, ErrorOnConnectStompServer, ErrorOnSendStompServer, RemoteControlViaFrameStompServer
+from .broker_simulator import AckRecordingStompServer, BlackHoleStompServer, EchoStompServer, ErrorOnConnectStompServer, ErrorOnSendStompServer, RemoteControlViaFrameStompServer
 
 observer = log.PythonLoggingObserver()
 observer.start()
@@ -195,6 +199,49 @@ class AsyncClientReplaySubscriptionTestCase(AsyncClientBaseTestCase):
         else:
             self._got_message.callback(None)
 
+class AsyncClientParseInThreadTestCase(AsyncClientBaseTestCase):
+    protocols = [RemoteControlViaFrameStompServer]
+
+    def setUp(self):
+        AsyncClientBaseTestCase.setUp(self)
+        self.patch(StompProtocol, 'PARSE_IN_THREAD_THRESHOLD', 1)
+
+    @defer.inlineCallbacks
+    def test_parse_in_thread(self):
+        port = self.connections[0].getHost().port
+        config = StompConfig(uri='tcp://localhost:%d' % port, version='1.1')
+        client = Stomp(config)
+        yield client.connect()
+
+        self._got_message = defer.Deferred()
+        client.subscribe('/queue/bla', headers={StompSpec.ID_HEADER: 4711}, listener=SubscriptionListener(self._on_message))
+        result = yield self._got_message
+        self.assertEquals(result, b'hi')
+
+        yield client.disconnect()
+        yield client.disconnected
+
+    def _on_message(self, client, msg):
+        self._got_message.callback(msg.body)
+
+class AsyncClientSendErrorTestCase(AsyncClientBaseTestCase):
+    protocols = [RemoteControlViaFrameStompServer]
+
+    @defer.inlineCallbacks
+    def test_errors_come_back_as_failed_deferreds(self):
+        port = self.connections[0].getHost().port
+        config = StompConfig(uri='tcp://localhost:%d' % port, version='1.1')
+        client = Stomp(config)
+
+        yield self.assertFailure(client.sendFrame(StompFrame(StompSpec.SEND)), StompConnectionError)
+
+        yield client.connect()
+        yield self.assertFailure(client.ack(StompFrame(StompSpec.MESSAGE)), StompProtocolError)
+        yield self.assertFailure(client.nack(StompFrame(StompSpec.MESSAGE)), StompProtocolError)
+
+        yield client.disconnect()
+        yield client.disconnected
+
 class AsyncClientMultiSubscriptionsTestCase(AsyncClientBaseTestCase):
     protocols = [RemoteControlViaFrameStompServer]
 
@@ -220,6 +267,231 @@ class AsyncClientMultiSubscriptionsTestCase(AsyncClientBaseTestCase):
     def _on_message(self, client, msg):
         pass
 
+class RecordingListener(Listener):
+    def __init__(self, name, events):
+        self.name = name
+        self.events = events
+        self.notified = None
+
+    def onMessage(self, connection, frame, context):
+        self.events.append((self.name, frame.headers[StompSpec.DESTINATION_HEADER]))
+        (notified, self.notified) = (self.notified, None)
+        if notified is not None:
+            notified.callback(None)
+
+class RecordingSubscriptionListener(SubscriptionListener):
+    def __init__(self, handler, events):
+        SubscriptionListener.__init__(self, handler)
+        self.events = events
+
+    def onMessage(self, connection, frame, context):
+        self.events.append(('any', frame.headers[StompSpec.DESTINATION_HEADER]))
+        return SubscriptionListener.onMessage(self, connection, frame, context)
+
+class AsyncClientMessageListenersTestCase(AsyncClientBaseTestCase):
+    protocols = [EchoStompServer]
+
+    @defer.inlineCallbacks
+    def test_message_listeners(self):
+        port = self.connections[0].getHost().port
+        config = StompConfig(uri='tcp://localhost:%d' % port, version='1.1')
+        client = Stomp(config)
+        yield client.connect()
+
+        events = []
+        a = SubscriptionListener(lambda _, frame: events.append(('a', frame.headers[StompSpec.DESTINATION_HEADER])))
+        b = SubscriptionListener(lambda _, frame: events.append(('b', frame.headers[StompSpec.DESTINATION_HEADER])))
+        c = RecordingSubscriptionListener(lambda _, frame: events.append(('c', frame.headers[StompSpec.DESTINATION_HEADER])), events)
+        for (name, listener) in [('a', a), ('b', b), ('c', c)]:
+            yield client.subscribe('/queue/%s' % name, headers={StompSpec.ID_HEADER: name}, listener=listener)
+        first = RecordingListener('first', events)
+        client.add(first)
+
+        yield self._send(client, '/queue/a', first)
+        self.assertEquals(events, [('a', '/queue/a'), ('any', '/queue/a'), ('first', '/queue/a')])
+        self.assertIn(a, client._listenersForMessage(a))
+        self.assertNotIn(b, client._listenersForMessage(a)) # b would ignore the message anyway
+        self.assertIn(c, client._listenersForMessage(a)) # c overrides onMessage
+
+        del events[:]
+        second = RecordingListener('second', events)
+        client.add(second)
+        yield self._send(client, '/queue/a', second)
+        self.assertEquals(events, [('a', '/queue/a'), ('any', '/queue/a'), ('first', '/queue/a'), ('second', '/queue/a')])
+
+        del events[:]
+        client.remove(first)
+        yield self._send(client, '/queue/c', second)
+        self.assertEquals(events, [('any', '/queue/c'), ('c', '/queue/c'), ('second', '/queue/c')])
+
+        yield client.disconnect()
+        yield client.disconnected
+
+    def _send(self, client, destination, listener):
+        listener.notified = defer.Deferred()
+        client.send(destination, b'hi')
+        return listener.notified
+
+class AsyncClientAckBatchTestCase(AsyncClientBaseTestCase):
+    protocols = [AckRecordingStompServer]
+
+    def setUp(self):
+        AsyncClientBaseTestCase.setUp(self)
+        self.patch(AckRecordingStompServer, 'acks', [])
+        self.patch(AckRecordingStompServer, 'acked', defer.Deferred())
+        self.patch(AckRecordingStompServer, 'disconnected', defer.Deferred())
+
+    @defer.inlineCallbacks
+    def test_cumulative_ack_per_batch(self):
+        self.patch(AckRecordingStompServer, 'messages', 5)
+        client = yield self._subscribe(SubscriptionListener(self._on_message, ackBatchSize=2), StompSpec.ACK_CLIENT)
+        yield self._got_messages
+        yield client.disconnect()
+        acks = yield AckRecordingStompServer.disconnected
+        self.assertEquals(acks, ['2', '4', '5']) # the last one is the pending ack sent upon disconnect
+        yield client.disconnected
+
+    @defer.inlineCallbacks
+    def test_cumulative_ack_per_interval(self):
+        clock = task.Clock()
+        self.patch(asyncListener, 'reactor', clock)
+        self.patch(AckRecordingStompServer, 'messages', 3)
+        self.patch(AckRecordingStompServer, 'expectedAcks', 1)
+        client = yield self._subscribe(SubscriptionListener(self._on_message, ackBatchInterval=10), StompSpec.ACK_CLIENT)
+        yield self._got_messages
+        self.assertEquals(AckRecordingStompServer.acks, [])
+        clock.advance(10)
+        acks = yield AckRecordingStompServer.acked
+        self.assertEquals(acks, ['3'])
+        yield client.disconnect()
+        acks = yield AckRecordingStompServer.disconnected
+        self.assertEquals(acks, ['3'])
+        yield client.disconnected
+
+    @defer.inlineCallbacks
+    def test_individual_acks_are_not_batched(self):
+        self.patch(AckRecordingStompServer, 'messages', 3)
+        client = yield self._subscribe(SubscriptionListener(self._on_message, ackBatchSize=2, ackBatchInterval=10), StompSpec.ACK_CLIENT_INDIVIDUAL)
+        yield self._got_messages
+        yield client.disconnect()
+        acks = yield AckRecordingStompServer.disconnected
+        self.assertEquals(acks, ['1', '2', '3'])
+        yield client.disconnected
+
+    @defer.inlineCallbacks
+    def test_cumulative_ack_for_handlers_finishing_out_of_order(self):
+        self.patch(AckRecordingStompServer, 'messages', 2)
+        self._handlers = {}
+        client = yield self._subscribe(SubscriptionListener(self._on_message_deferred, ackBatchSize=10), StompSpec.ACK_CLIENT)
+        yield self._got_messages
+        self._handlers['2'].callback(None)
+        self._handlers['1'].callback(None)
+        yield client.disconnect()
+        acks = yield AckRecordingStompServer.disconnected
+        self.assertEquals(acks, ['2']) # the ack for the later message covers the earlier one
+        yield client.disconnected
+
+    @defer.inlineCallbacks
+    def test_pending_acks_are_sent_before_unsubscribe(self):
+        self.patch(AckRecordingStompServer, 'messages', 3)
+        self.patch(AckRecordingStompServer, 'unsubscribed', defer.Deferred())
+        client = yield self._subscribe(SubscriptionListener(self._on_message, ackBatchSize=10), StompSpec.ACK_CLIENT)
+        yield self._got_messages
+        yield client.unsubscribe(self._token)
+        acks = yield AckRecordingStompServer.unsubscribed
+        self.assertEquals(acks, ['3'])
+        yield client.disconnect()
+        acks = yield AckRecordingStompServer.disconnected
+        self.assertEquals(acks, ['3'])
+        yield client.disconnected
+
+    @defer.inlineCallbacks
+    def test_disconnect_waits_for_message_handler(self):
+        self._handled = []
+        client = yield self._subscribe(SubscriptionListener(self._on_message_later), StompSpec.ACK_CLIENT_INDIVIDUAL)
+        yield self._got_messages
+        self.assertEquals(self._handled, [])
+        yield client.disconnect()
+        self.assertEquals(self._handled, ['1'])
+        acks = yield AckRecordingStompServer.disconnected
+        self.assertEquals(acks, ['1'])
+        yield client.disconnected
+
+    @defer.inlineCallbacks
+    def _subscribe(self, listener, ack):
+        port = self.connections[0].getHost().port
+        config = StompConfig(uri='tcp://localhost:%d' % port, version='1.1')
+        client = Stomp(config)
+        yield client.connect()
+        self._got_messages = defer.Deferred()
+        self._received = 0
+        self._token = yield client.subscribe('/queue/bla', headers={StompSpec.ID_HEADER: 4711, StompSpec.ACK_HEADER: ack}, listener=listener)
+        defer.returnValue(client)
+
+    def _on_message(self, client, msg):
+        self._received += 1
+        if self._received == AckRecordingStompServer.messages:
+            reactor.callLater(0, self._got_messages.callback, None) # @UndefinedVariable
+
+    def _on_message_deferred(self, client, msg):
+        self._handlers[msg.headers[StompSpec.MESSAGE_ID_HEADER]] = handled = defer.Deferred()
+        self._on_message(client, msg)
+        return handled
+
+    def _on_message_later(self, client, msg):
+        self._on_message(client, msg)
+        return task.deferLater(reactor, 0.01, self._handled.append, msg.headers[StompSpec.MESSAGE_ID_HEADER])
+
+# async def is a syntax error before Python 3.5, so we compile the coroutine handlers only where they are supported
+COROUTINE_HANDLERS = """
+async def succeed(client, frame):
+    await task.deferLater(reactor, 0, lambda: None)
+
+async def fail(client, frame):
+    await task.deferLater(reactor, 0, lambda: None)
+    raise RuntimeError('hi')
+"""
+
+class AsyncClientCoroutineHandlerTestCase(AsyncClientBaseTestCase):
+    protocols = [AckRecordingStompServer]
+    if sys.version_info < (3, 5):
+        skip = 'async def requires Python 3.5 or higher'
+
+    def setUp(self):
+        AsyncClientBaseTestCase.setUp(self)
+        self.patch(AckRecordingStompServer, 'acks', [])
+        self.patch(AckRecordingStompServer, 'sends', [])
+        self.patch(AckRecordingStompServer, 'expectedAcks', 1)
+        self.patch(AckRecordingStompServer, 'acked', defer.Deferred())
+        self.patch(AckRecordingStompServer, 'disconnected', defer.Deferred())
+        self.handlers = {'task': task, 'reactor': reactor}
+        exec(COROUTINE_HANDLERS, self.handlers)
+
+    @defer.inlineCallbacks
+    def test_coroutine_handler(self):
+        acks, sends = yield self._handle(SubscriptionListener(self.handlers['succeed'], errorDestination='/queue/errors'))
+        self.assertEquals(acks, ['1'])
+        self.assertEquals(sends, [])
+
+    @defer.inlineCallbacks
+    def test_failing_coroutine_handler(self):
+        acks, sends = yield self._handle(SubscriptionListener(self.handlers['fail'], errorDestination='/queue/errors'))
+        self.assertEquals(acks, ['1'])
+        self.assertEquals(sends, ['/queue/errors'])
+
+    @defer.inlineCallbacks
+    def _handle(self, listener):
+        port = self.connections[0].getHost().port
+        config = StompConfig(uri='tcp://localhost:%d' % port, version='1.1')
+        client = Stomp(config)
+        yield client.connect()
+        yield client.subscribe('/queue/bla', headers={StompSpec.ID_HEADER: 4711}, listener=listener)
+        yield AckRecordingStompServer.acked
+        yield client.disconnect()
+        acks = yield AckRecordingStompServer.disconnected
+        yield client.disconnected
+        defer.returnValue((acks, list(AckRecordingStompServer.sends)))
+
 class AsyncClientDisconnectTimeoutTestCase(AsyncClientBaseTestCase):
     protocols = [RemoteControlViaFrameStompServer]
 
@@ -271,6 +543,37 @@ class AsyncClientDisconnectTimeoutTestCase(AsyncClientBaseTestCase):
         self._got_message.callback(None)
         yield self.wait
 
+class StompProtocolTestCase(unittest.TestCase):
+    def test_frames_sent_while_dispatching_are_written_at_once(self):
+        protocol = StompProtocol(lambda frame: protocol.send(StompFrame(StompSpec.ACK, {StompSpec.MESSAGE_ID_HEADER: frame.headers[StompSpec.MESSAGE_ID_HEADER]})), lambda reason: None)
+        transport = StringTransport()
+        writes = []
+        writeSequence = transport.writeSequence
+        self.patch(transport, 'writeSequence', lambda data: writes.append(data) or writeSequence(data))
+        protocol.makeConnection(transport)
+
+        messages = [StompFrame(StompSpec.MESSAGE, {StompSpec.MESSAGE_ID_HEADER: messageId}, b'hi') for messageId in ('1', '2')]
+        protocol.dataReceived(b''.join(bytes(message) for message in messages))
+        acks = [StompFrame(StompSpec.ACK, {StompSpec.MESSAGE_ID_HEADER: messageId}) for messageId in ('1', '2')]
+        self.assertEquals(len(writes), 1)
+        self.assertEquals(transport.value(), b''.join(bytes(ack) for ack in acks))
+
+        protocol.send(acks[0])
+        self.assertEquals(len(writes), 2)
+
+    def test_send_checks_current_log_level(self):
+        protocol = StompProtocol(lambda frame: None, lambda reason: None)
+        protocol.makeConnection(StringTransport())
+        logged = []
+        self.patch(protocol.log, 'debug', lambda msg, *args: logged.append(msg % args))
+        self.patch(protocol.log, 'isEnabledFor', lambda level: False)
+        protocol.send(StompFrame(StompSpec.ACK, {StompSpec.MESSAGE_ID_HEADER: '1'}))
+        self.assertEquals(logged, [])
+        self.patch(protocol.log, 'isEnabledFor', lambda level: True)
+        protocol.send(StompFrame(StompSpec.ACK, {StompSpec.MESSAGE_ID_HEADER: '2'}))
+        self.assertEquals(len(logged), 1)
+        self.assertIn('ACK', logged[0])
+
 if __name__ == '__main__':
     import sys
     from twisted.scripts import trial
@@ -4,7 +4,7 @@ from twisted.internet import defer, reactor
 from twisted.internet.defer import CancelledError
 from twisted.trial import unittest
 
-from stompest.async.util import InFlightOperations
+from stompest.async.util import InFlightOperations, WaitingDeferred
 from stompest.error import StompCancelledError
 
 logging.basicConfig(level=logging.DEBUG)
@@ -115,6 +115,16 @@ class InFlightOperationsTest(unittest.TestCase):
             self.assertEquals(list(op), [None])
         self.assertEquals(list(op), [])
 
+    @defer.inlineCallbacks
+    def test_no_timeout_if_called(self):
+        w = WaitingDeferred()
+        w.callback(4711)
+        delayedCalls = len(reactor.getDelayedCalls()) # @UndefinedVariable
+        d = w.wait(timeout=1, fail=RuntimeError('hi'))
+        self.assertEquals(len(reactor.getDelayedCalls()), delayedCalls) # @UndefinedVariable
+        result = yield d
+        self.assertEquals(result, 4711)
+
 if __name__ == '__main__':
     import sys
     from twisted.scripts import trial
@@ -20,6 +20,7 @@ class BlackHoleStompServer(Protocol):
             StompSpec.DISCONNECT: self.handleDisconnect,
             StompSpec.SEND: self.handleSend,
             StompSpec.SUBSCRIBE: self.handleSubscribe,
+            StompSpec.UNSUBSCRIBE: self.handleUnsubscribe,
             StompSpec.ACK: self.handleAck,
             StompSpec.NACK: self.handleNack
         }
@@ -55,6 +56,9 @@ class BlackHoleStompServer(Protocol):
     def handleSubscribe(self, frame):
         pass
 
+    def handleUnsubscribe(self, frame):
+        pass
+
     def handleAck(self, frame):
         pass
 
@@ -107,6 +111,54 @@ class RemoteControlViaFrameStompServer(BlackHoleStompServer):
             pass
         self.transport.write(self.getFrame(StompSpec.MESSAGE, replyHeaders, b'hi'))
 
+class AckRecordingStompServer(RemoteControlViaFrameStompServer):
+    messages = 1 # number of MESSAGE frames sent upon SUBSCRIBE (with message ids 1, 2, ...)
+    acks = None # message ids of the received ACK frames
+    expectedAcks = None
+    acked = None # calls back with the message ids of the ACK frames when expectedAcks of them arrived
+    disconnected = None # calls back with the message ids of the ACK frames received before the DISCONNECT frame
+    unsubscribed = None # calls back with the message ids of the ACK frames received before the UNSUBSCRIBE frame
+    sends = None # destinations of the received SEND frames
+
+    def handleAck(self, frame):
+        self.acks.append(frame.headers[StompSpec.MESSAGE_ID_HEADER])
+        if len(self.acks) == self.expectedAcks:
+            self.acked.callback(list(self.acks))
+
+    def handleDisconnect(self, frame):
+        self.disconnected.callback(list(self.acks))
+        RemoteControlViaFrameStompServer.handleDisconnect(self, frame)
+
+    def handleUnsubscribe(self, frame):
+        self.unsubscribed.callback(list(self.acks))
+
+    def handleSend(self, frame):
+        if self.sends is not None:
+            self.sends.append(frame.headers[StompSpec.DESTINATION_HEADER])
+        RemoteControlViaFrameStompServer.handleSend(self, frame)
+
+    def handleSubscribe(self, frame):
+        headers = frame.headers
+        for messageId in range(1, self.messages + 1):
+            replyHeaders = {StompSpec.DESTINATION_HEADER: headers[StompSpec.DESTINATION_HEADER], StompSpec.MESSAGE_ID_HEADER: messageId, StompSpec.SUBSCRIPTION_HEADER: headers[StompSpec.ID_HEADER]}
+            self.transport.write(self.getFrame(StompSpec.MESSAGE, replyHeaders, b'hi'))
+
+class EchoStompServer(RemoteControlViaFrameStompServer):
+    """Send each SEND frame back as a MESSAGE frame to the subscription of its destination."""
+    def connectionMade(self):
+        RemoteControlViaFrameStompServer.connectionMade(self)
+        self._subscriptions = {}
+        self._messageIds = 0
+
+    def handleSend(self, frame):
+        destination = frame.headers[StompSpec.DESTINATION_HEADER]
+        self._messageIds += 1
+        headers = {StompSpec.DESTINATION_HEADER: destination, StompSpec.MESSAGE_ID_HEADER: self._messageIds, StompSpec.SUBSCRIPTION_HEADER: self._subscriptions[destination]}
+        self.transport.write(self.getFrame(StompSpec.MESSAGE, headers, frame.body))
+
+    def handleSubscribe(self, frame):
+        self._subscriptions[frame.headers[StompSpec.DESTINATION_HEADER]] = frame.headers[StompSpec.ID_HEADER]
+
 if __name__ == '__main__':
     logging.basicConfig(level=logging.DEBUG)
     factory = Factory()
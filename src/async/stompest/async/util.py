@@ -1,6 +1,11 @@
 import collections
 import contextlib
 
+try:
+    from inspect import iscoroutine
+except ImportError: # Python < 3.5
+    iscoroutine = lambda _: False
+
 from twisted.internet import defer, reactor
 from twisted.internet.endpoints import clientFromString
 
@@ -40,19 +45,19 @@ class InFlightOperations(collections.MutableMapping):
     def __call__(self, key, log=None):
         self[key] = waiting = WaitingDeferred()
         info = self.info(key)
-        log and log.debug('%s started.' % info)
+        log and log.debug('%s started.', info)
         try:
             yield waiting
             if not waiting.called:
                 waiting.callback(None)
         except Exception as e:
-            log and log.error('%s failed [%s]' % (info, e))
+            log and log.error('%s failed [%s]', info, e)
             if not waiting.called:
                 waiting.errback(e)
             raise
         finally:
             self.pop(key)
-        log and log.debug('%s complete.' % info)
+        log and log.debug('%s complete.', info)
 
     def info(self, key):
         return ' '.join(map(str, filter(None, (self._info, key))))
@@ -60,15 +65,22 @@ class InFlightOperations(collections.MutableMapping):
 class WaitingDeferred(defer.Deferred):
     @defer.inlineCallbacks
     def wait(self, timeout=None, fail=None):
-        if timeout is not None:
-            timeout = reactor.callLater(timeout, self.errback, fail) # @UndefinedVariable
+        timeoutCall = None
+        if (timeout is not None) and not self.called: # no need to schedule a timeout if the result is already there
+            timeoutCall = reactor.callLater(timeout, self.errback, fail) # @UndefinedVariable
         try:
             result = yield self
         finally:
-            if timeout and not timeout.called:
-                timeout.cancel()
+            if timeoutCall and not timeoutCall.called:
+                timeoutCall.cancel()
         defer.returnValue(result)
 
+def fromCoroutine(result):
+    """If **result** is a coroutine (that is, it was produced by an ``async def`` function), wrap it into a :class:`twisted.internet.defer.Deferred`. Any other **result** is returned as is."""
+    if iscoroutine(result):
+        return defer.ensureDeferred(result)
+    return result
+
 def endpointFactory(broker, timeout=None):
     timeout = (':timeout=%d' % timeout) if timeout else ''
     locals().update(broker)
@@ -253,11 +253,12 @@ def message(frame):
     .. seealso :: The :func:`subscribe` command.
     """
     _checkCommand(frame, [StompSpec.MESSAGE])
-    _checkHeader(frame, StompSpec.MESSAGE_ID_HEADER)
-    destination = _checkHeader(frame, StompSpec.DESTINATION_HEADER)
+    headers = frame.headers
+    _checkHeader(frame, StompSpec.MESSAGE_ID_HEADER, headers)
+    destination = _checkHeader(frame, StompSpec.DESTINATION_HEADER, headers)
     subscription = None
     try:
-        subscription = _checkHeader(frame, StompSpec.SUBSCRIPTION_HEADER)
+        subscription = _checkHeader(frame, StompSpec.SUBSCRIPTION_HEADER, headers)
     except StompProtocolError:
         if frame.version != StompSpec.VERSION_1_0:
             raise
@@ -284,25 +285,26 @@ versions = _versions = StompSpec.versions
 def _ackHeaders(frame, transactions):
     version = frame.version
     _checkCommand(frame, [StompSpec.MESSAGE])
-    _checkHeader(frame, StompSpec.MESSAGE_ID_HEADER)
+    headers = frame.headers
+    _checkHeader(frame, StompSpec.MESSAGE_ID_HEADER, headers)
     if version != StompSpec.VERSION_1_0:
-        _checkHeader(frame, StompSpec.SUBSCRIPTION_HEADER)
+        _checkHeader(frame, StompSpec.SUBSCRIPTION_HEADER, headers)
     if version in (StompSpec.VERSION_1_0, StompSpec.VERSION_1_1):
         keys = {
             StompSpec.SUBSCRIPTION_HEADER: StompSpec.SUBSCRIPTION_HEADER,
             StompSpec.MESSAGE_ID_HEADER: StompSpec.MESSAGE_ID_HEADER
         }
     else:
-        _checkHeader(frame, StompSpec.ACK_HEADER)
+        _checkHeader(frame, StompSpec.ACK_HEADER, headers)
         keys = {StompSpec.ACK_HEADER: StompSpec.ID_HEADER}
     try:
-        transaction = frame.headers[StompSpec.TRANSACTION_HEADER]
+        transaction = headers[StompSpec.TRANSACTION_HEADER]
     except KeyError:
         pass
     else:
         if transaction in set(transactions or []):
             keys[StompSpec.TRANSACTION_HEADER] = StompSpec.TRANSACTION_HEADER
-    return {keys[key]: value for (key, value) in frame.headers.items() if key in keys}
+    return {keys[key]: value for (key, value) in headers.items() if key in keys}
 
 def _addReceiptHeader(frame, receipt):
     if not receipt:
@@ -316,8 +318,8 @@ def _checkCommand(frame, commands=None):
     if frame.command not in (commands or StompSpec.COMMANDS):
         raise StompProtocolError('Cannot handle command: %s [expected=%s, headers=%s]' % (frame.command, ', '.join(commands), frame.headers))
 
-def _checkHeader(frame, header):
+def _checkHeader(frame, header, headers=None):
     try:
-        return frame.headers[header]
+        return (frame.headers if (headers is None) else headers)[header]
     except KeyError:
         raise StompProtocolError('Invalid %s frame (%s header mandatory in version %s) [headers=%s]' % (frame.command, header, frame.version, frame.headers))
@@ -51,6 +51,9 @@ class StompFrame(object):
     
     """
     INFO_LENGTH = 20
+    _HEADS = {} # rendered heads of SEND frames: producers tend to send many frames with the same headers
+    _MAX_HEADS = 1024 # once that many distinct heads were rendered, the headers vary per frame (e.g., correlation ids), so we stop caching
+    _CACHEABLE_TYPES = frozenset([binaryType, textType, int])
     _KEYWORDS_AND_FIELDS = [('headers', '_headers', {}), ('body', 'body', b''), ('rawHeaders', 'rawHeaders', None), ('version', 'version', StompSpec.DEFAULT_VERSION)]
 
     def __init__(self, command, headers=None, body=b'', rawHeaders=None, version=None):
@@ -61,7 +64,7 @@ class StompFrame(object):
         self.rawHeaders = rawHeaders
 
     def __bytes__(self):
-        return b''.join([self._encode(StompSpec.LINE_DELIMITER.join(self._headlines)), self.body, self._encode(StompSpec.FRAME_DELIMITER)])
+        return b''.join(self.chunks())
 
     def __eq__(self, other):
         """Two frames are considered equal if, and only if, they render the same wire-level frame, that is, if their string representation is identical."""
@@ -88,6 +91,10 @@ class StompFrame(object):
     def __str__(self):
         return self.__bytes__()
 
+    def chunks(self):
+        """Produce the wire-level frame as a list of binary strings (head, body, and frame delimiter) whose concatenation is the frame's string representation. The body is not copied, so you may pass this list on to a vectored write (e.g., :meth:`twisted.internet.interfaces.ITransport.writeSequence`)."""
+        return [self._head(), self.body, self._encode(StompSpec.FRAME_DELIMITER)]
+
     def info(self):
         """Produce a log-friendly representation of the frame (show only non-trivial content, and truncate the message to INFO_LENGTH characters)."""
         headers = self.headers and 'headers=%s' % self.headers
@@ -131,6 +138,31 @@ class StompFrame(object):
         self.headers = self.headers
         self.rawHeaders = None
 
+    def _head(self):
+        heads = StompFrame._HEADS
+        if (heads is None) or (self.command != StompSpec.SEND) or (self.rawHeaders is not None):
+            return self._renderHead()
+        headers = self.headers
+        if StompSpec.RECEIPT_HEADER in headers: # receipt ids are unique, so such a head would never be reused
+            return self._renderHead()
+        cacheable = self._CACHEABLE_TYPES
+        for (header, value) in headers.items():
+            # only types whose equal values render identically (1.0 == 1, but they render differently)
+            if (type(header) not in cacheable) or (type(value) not in cacheable):
+                return self._renderHead()
+        key = (self.version, frozenset(headers.items()))
+        head = heads.get(key)
+        if head is None:
+            head = self._renderHead()
+            if len(heads) < self._MAX_HEADS:
+                heads[key] = head
+            else:
+                StompFrame._HEADS = None
+        return head
+
+    def _renderHead(self):
+        return self._encode(StompSpec.LINE_DELIMITER.join(self._headlines))
+
     @property
     def _escape(self):
         return escape(self.version, self.command)
@@ -168,5 +200,8 @@ class StompHeartBeat(object):
     def __str__(self):
         return self.__bytes__()
 
+    def chunks(self):
+        return [self.__bytes__()]
+
     def info(self):
         return 'heart-beat'
@@ -53,6 +53,7 @@ class StompParser(object):
         self._data += data
         while self._parse():
             pass
+        self._compact()
 
     def canRead(self):
         """Indicates whether there are frames available.
@@ -76,6 +77,17 @@ class StompParser(object):
         self._frames.append(self._frame)
         self._next()
 
+    def _compact(self):
+        # drop the consumed data once per add() instead of once per frame (which is quadratic in the number of frames per chunk)
+        position = self._start
+        if not position:
+            return
+        self._data[:position] = b''
+        self._start = 0
+        self._seek -= position
+        if self._eof is not None:
+            self._eof -= position
+
     def _flush(self):
         self._truncate(len(self._data))
         self._next()
@@ -96,7 +108,7 @@ class StompParser(object):
         self._frame.body = memoryview(self._data)[self._start:self._eof].tobytes()
         if self._frame.body and (self._frame.command not in self._commandsBodyAllowed):
             self._raise('No body allowed for this command (version %s): %r' % (self.version, self._frame.command))
-        self._truncate(self._eof + 1)
+        self._seek = self._start = self._eof + 1
         self._append()
         return True
 
@@ -117,29 +129,31 @@ class StompParser(object):
             endOfHead = self._findHead(self._data, self._start).end()
         except AttributeError:
             return
-        command, rawHeaders = None, []
-        for line in self._data[self._start:endOfHead].decode(self._codec).split(StompSpec.LINE_DELIMITER):
-            if line[-1:] == self._stripLineDelimiter:
+        lines = iter(self._data[self._start:endOfHead].decode(self._codec).split(StompSpec.LINE_DELIMITER))
+        stripLineDelimiter = self._stripLineDelimiter
+        command = next(lines)
+        if stripLineDelimiter and (command[-1:] == stripLineDelimiter):
+            command = command[:-1]
+        if command not in self._commands:
+            self._raise('Invalid command (version %s): %r' % (self.version, command))
+        _unescape = unescape(self.version, command)
+        rawHeaders, contentLength = [], None
+        for line in lines:
+            if stripLineDelimiter and (line[-1:] == stripLineDelimiter):
                 line = line[:-1]
-            if command is None:
-                command = line
-                if command not in self._commands:
-                    self._raise('Invalid command (version %s): %r' % (self.version, command))
-                _unescape = unescape(self.version, command)
-                continue
             if not line:
                 break
-            try:
-                name, value = line.split(StompSpec.HEADER_SEPARATOR, 1)
-            except ValueError:
+            name, separator, value = line.partition(StompSpec.HEADER_SEPARATOR)
+            if not separator:
                 self._raise('No separator in header line: %r' % line)
-            rawHeaders.append((_unescape(name), _unescape(value)))
+            name, value = _unescape(name), _unescape(value)
+            if (contentLength is None) and (name == StompSpec.CONTENT_LENGTH_HEADER): # the first of repeated headers wins (cf. StompFrame.headers)
+                contentLength = value
+            rawHeaders.append((name, value))
         self._frame = StompFrame(command=command, rawHeaders=rawHeaders, version=self.version)
         self._start = endOfHead
-        try:
-            self._eof = self._seek = self._start + int(self._frame.headers[StompSpec.CONTENT_LENGTH_HEADER])
-        except KeyError:
-            pass
+        if contentLength is not None:
+            self._eof = self._seek = self._start + int(contentLength)
         return True
 
     def _parseHeartBeat(self):
@@ -55,7 +55,7 @@ import time
 
 from stompest.error import StompConnectionError, StompProtocolError
 from stompest.protocol import StompFailoverTransport, StompFrame, StompSession
-from stompest.util import checkattr
+from stompest.util import checkattr, frameInfo
 
 from stompest.sync.transport import StompFrameTransport
 
@@ -116,20 +116,20 @@ class Stomp(object):
                     broker['host'], broker['port'], sslContext=self._config.sslContext,
                 )
                 if connectDelay:
-                    self.log.debug('Delaying connect attempt for %d ms' % int(connectDelay * 1000))
+                    self.log.debug('Delaying connect attempt for %d ms', int(connectDelay * 1000))
                     time.sleep(connectDelay)
-                self.log.info('Connecting to %s ...' % transport)
+                self.log.info('Connecting to %s ...', transport)
                 try:
                     transport.connect(connectTimeout)
                 except StompConnectionError as e:
-                    self.log.warning('Could not connect to %s [%s]' % (transport, e))
+                    self.log.warning('Could not connect to %s [%s]', transport, e)
                 else:
                     self.log.info('Connection established')
                     self._transport = transport
                     self._connect(headers, versions, host, heartBeats, connectedTimeout)
                     break
         except StompConnectionError as e:
-            self.log.error('Reconnect failed [%s]' % e)
+            self.log.error('Reconnect failed [%s]', e)
             raise
 
     def _connect(self, headers, versions, host, heartBeats, timeout):
@@ -140,10 +140,10 @@ class Stomp(object):
             raise StompProtocolError('STOMP session connect failed [timeout=%s]' % timeout)
         frame = self.receiveFrame()
         self.session.connected(frame)
-        self.log.info('Connected to stomp broker [session=%s, version=%s]' % (self.session.id, self.session.version))
+        self.log.info('Connected to stomp broker [session=%s, version=%s]', self.session.id, self.session.version)
         self._transport.setVersion(self.session.version)
         for (destination, headers, receipt, _) in self.session.replay():
-            self.log.info('Replaying subscription %s' % headers)
+            self.log.info('Replaying subscription %s', headers)
             self.subscribe(destination, headers, receipt)
 
     @connected
@@ -323,7 +323,7 @@ class Stomp(object):
             frame = self._transport.receive()
             self.session.received()
             if self.log.isEnabledFor(logging.DEBUG):
-                self.log.debug('Received %s' % frame.info())
+                self.log.debug('Received %s', frameInfo(frame))
             if isinstance(frame, StompFrame): # there's a real STOMP frame on the wire, not a heart-beat (duck-typing didn't work in Py3)
                 self._messages.append(frame)
                 return True
@@ -336,7 +336,7 @@ class Stomp(object):
         .. note :: If we are not connected, this method, and all other API commands for sending STOMP frames except :meth:`~.sync.client.Stomp.connect`, will raise a :class:`~.StompConnectionError`. Use this command only if you have to bypass the :class:`~.StompSession` logic and you know what you're doing!
         """
         if self.log.isEnabledFor(logging.DEBUG):
-            self.log.debug('Sending %s' % frame.info())
+            self.log.debug('Sending %s', frameInfo(frame))
         self._transport.send(frame)
         self.session.sent()
 
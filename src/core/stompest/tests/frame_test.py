@@ -1,7 +1,10 @@
+import decimal
 import unittest
 
 from stompest._backwards import binaryType
 from stompest.protocol import StompFrame, StompSpec
+from stompest.protocol.frame import StompHeartBeat
+from stompest.tests import mock
 
 class StompFrameTest(unittest.TestCase):
     def test_frame(self):
@@ -136,6 +139,47 @@ lines\x00""" % (StompSpec.SEND, StompSpec.DESTINATION_HEADER)).encode())
             frame.version = version
             self.assertEqual(binaryType(frame), frameBytes)
 
+    def test_chunks(self):
+        body = b'two\nlines'
+        frame = StompFrame(StompSpec.SEND, {StompSpec.DESTINATION_HEADER: '/queue/world'}, body)
+        chunks = frame.chunks()
+        self.assertEqual(chunks, [b'SEND\ndestination:/queue/world\n\n', body, b'\x00'])
+        self.assertTrue(chunks[1] is body)
+        self.assertEqual(b''.join(chunks), binaryType(frame))
+        self.assertEqual(StompHeartBeat().chunks(), [b'\n'])
+
+    def test_send_head_cache(self):
+        headers = {StompSpec.DESTINATION_HEADER: '/queue/world', 'a': 1}
+        head = StompFrame(StompSpec.SEND, dict(headers), b'one').chunks()[0]
+        self.assertEqual(head, b'SEND\na:1\ndestination:/queue/world\n\n')
+        self.assertIs(StompFrame(StompSpec.SEND, dict(headers), b'two').chunks()[0], head)
+        headers['a'] = 1.0
+        self.assertEqual(StompFrame(StompSpec.SEND, headers).chunks()[0], b'SEND\na:1.0\ndestination:/queue/world\n\n')
+        self.assertEqual(StompFrame(StompSpec.SEND, headers, version=StompSpec.VERSION_1_2).chunks()[0], b'SEND\na:1.0\ndestination:/queue/world\n\n')
+        headers['a'] = '\n'
+        self.assertEqual(StompFrame(StompSpec.SEND, headers).chunks()[0], b'SEND\na:\n\ndestination:/queue/world\n\n')
+        self.assertEqual(StompFrame(StompSpec.SEND, headers, version=StompSpec.VERSION_1_2).chunks()[0], b'SEND\na:\\n\ndestination:/queue/world\n\n')
+        headers['a'] = [1]
+        self.assertEqual(StompFrame(StompSpec.SEND, headers).chunks()[0], b'SEND\na:[1]\ndestination:/queue/world\n\n')
+
+        for values in [(decimal.Decimal('1.0'), decimal.Decimal('1.00')), (0.0, -0.0), ((1,), (1.0,))]:
+            for value in values:
+                headers['a'] = value
+                self.assertEqual(StompFrame(StompSpec.SEND, headers).chunks()[0], ('SEND\na:%s\ndestination:/queue/world\n\n' % (value,)).encode())
+
+        headers = {StompSpec.DESTINATION_HEADER: '/queue/world', StompSpec.RECEIPT_HEADER: 'message-1'}
+        size = len(StompFrame._HEADS)
+        StompFrame(StompSpec.SEND, headers).chunks()
+        self.assertEqual(len(StompFrame._HEADS), size)
+
+    def test_send_head_cache_stops_when_full(self):
+        with mock.patch.object(StompFrame, '_HEADS', {}), mock.patch.object(StompFrame, '_MAX_HEADS', 2):
+            for correlationId in range(3):
+                headers = {StompSpec.DESTINATION_HEADER: '/queue/world', 'correlation-id': correlationId}
+                self.assertEqual(StompFrame(StompSpec.SEND, headers).chunks()[0], ('SEND\ncorrelation-id:%d\ndestination:/queue/world\n\n' % correlationId).encode())
+            self.assertIs(StompFrame._HEADS, None) # headers vary per frame, so caching would not pay
+            self.assertEqual(StompFrame(StompSpec.SEND, headers).chunks()[0], b'SEND\ncorrelation-id:2\ndestination:/queue/world\n\n')
+
     def test_frame_info(self):
         frame = StompFrame(StompSpec.MESSAGE, headers={'a': 'c'}, body=b'More text than fits a short info.', version=StompSpec.VERSION_1_1)
         self.assertEqual(frame.info().replace("b'", "'").replace("u'", "'"), "MESSAGE frame [headers={'a': 'c'}, body='More text than fits ...', version=1.1]")
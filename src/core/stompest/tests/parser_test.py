@@ -307,5 +307,15 @@ repeat:2
         frame = parser.get()
         self.assertEqual(frame.headers['repeat'], '1')
 
+    def test_keep_first_of_repeated_content_length_headers(self):
+        body = b'\x00\x01\x00\x02'
+        parser = StompParser()
+        parser.add(b'MESSAGE\ncontent-length:4\ncontent-length:1\n\n' + body + b'\x00' + binaryType(commands.disconnect()))
+        frame = parser.get()
+        self.assertEqual(frame.body, body)
+        self.assertEqual(frame.headers[StompSpec.CONTENT_LENGTH_HEADER], '4')
+        self.assertEqual(parser.get(), commands.disconnect())
+        self.assertIsNone(parser.get())
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,6 +1,8 @@
+import logging
 import unittest
 
-from stompest.util import filterReservedHeaders
+from stompest.protocol import StompFrame, StompSpec
+from stompest.util import filterReservedHeaders, frameInfo
 
 class UtilTest(unittest.TestCase):
     def test_filterReservedHeaders(self):
@@ -12,5 +14,14 @@ class UtilTest(unittest.TestCase):
         self.assertFalse('timestamp' in filteredHdrs)
         self.assertTrue('foo' in filteredHdrs)
 
+    def test_frameInfo(self):
+        frame = StompFrame(StompSpec.SEND, {StompSpec.DESTINATION_HEADER: '/queue/world'}, b'body')
+        frame.info = lambda: self.fail('info() called for a discarded log record')
+        log = logging.getLogger(__name__)
+        log.setLevel(logging.INFO)
+        log.debug('Sending %s', frameInfo(frame))
+        del frame.info
+        self.assertEqual(str(frameInfo(frame)), frame.info())
+
 if __name__ == '__main__':
     unittest.main()
@@ -7,6 +7,18 @@ from stompest.protocol import StompSpec
 
 _RESERVED_HEADERS = set([StompSpec.MESSAGE_ID_HEADER, StompSpec.DESTINATION_HEADER, 'timestamp', 'expires', 'priority'])
 
+class _FrameInfo(object):
+    """Defer :meth:`~.StompFrame.info` until a log record actually needs it."""
+    __slots__ = ('_frame',)
+
+    def __init__(self, frame):
+        self._frame = frame
+
+    def __str__(self):
+        return self._frame.info()
+
+frameInfo = _FrameInfo
+
 def filterReservedHeaders(headers):
     return dict((header, value) for (header, value) in headers.items() if header not in _RESERVED_HEADERS)
 